@@ -1,17 +1,23 @@
 """
 外部API调用客户端模块
 封装图片生成、文本处理、规则逻辑生成等外部API调用
+requests在首次发起请求时才导入，避免拖慢命令行启动
 """
 
-import requests
-
 import base64
-import requests
+import json
+import time
+
+from event_planning_system.model_router import default_router
 
 class ImageGenerationClient:
-    def __init__(self):
+    def __init__(self, router=None):
+        """
+        :param router: ModelRouter，用于记录调用耗时，默认使用进程内共享的路由器
+        """
         self.api_url = "https://llmapi.lcpu.dev/v1/images/generations"
         self.api_key = "YOUR_API_KEY"
+        self.router = router or default_router
 
     def generate_image(self, prompt, model="flux-dev", size="1024x1024"):
         """
@@ -21,6 +27,8 @@ class ImageGenerationClient:
         :param size: 图片尺寸
         :return: 图片二进制数据列表
         """
+        import requests
+
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}"
@@ -30,6 +38,8 @@ class ImageGenerationClient:
             "prompt": prompt,
             "size": size
         }
+        error = None
+        start = time.perf_counter()
         try:
             response = requests.post(self.api_url, headers=headers, json=data, timeout=300)
             if response.status_code == 200:
@@ -43,11 +53,15 @@ class ImageGenerationClient:
                             images_data.append(img_response.content)
                 return images_data
             else:
+                error = f"状态码{response.status_code}"
                 print(f"图片生成API请求失败，状态码: {response.status_code}")
                 return None
         except requests.exceptions.RequestException as e:
+            error = str(e)
             print(f"图片生成API请求异常: {e}")
             return None
+        finally:
+            self.router.record("主视觉生成", "draft", model, time.perf_counter() - start, error=error, prompt=prompt)
 
     def generate_image_with_elements(self, prompt, images, model="doubao-1.5-vision-pro-250328", size="1024x1024"):
         """
@@ -58,6 +72,8 @@ class ImageGenerationClient:
         :param size: 图片尺寸
         :return: 图片二进制数据列表
         """
+        import requests
+
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}"
@@ -71,6 +87,8 @@ class ImageGenerationClient:
             "size": size,
             "elements_images": base64_images  # 假设API支持此字段传递图片
         }
+        error = None
+        start = time.perf_counter()
         try:
             response = requests.post(self.api_url, headers=headers, json=data, timeout=300)
             if response.status_code == 200:
@@ -84,80 +102,126 @@ class ImageGenerationClient:
                             images_data.append(img_response.content)
                 return images_data
             else:
+                error = f"状态码{response.status_code}"
                 print(f"图片生成API请求失败，状态码: {response.status_code}")
                 return None
         except requests.exceptions.RequestException as e:
+            error = str(e)
             print(f"图片生成API请求异常: {e}")
             return None
+        finally:
+            self.router.record("主视觉生成", "draft", model, time.perf_counter() - start, error=error, prompt=prompt)
 
 class TextProcessingClient:
-    def __init__(self, model="deepseek-chat"):
+    def __init__(self, model=None, router=None):
         """
         初始化文本处理客户端，支持选择不同的LLM模型
-        :param model: 使用的模型名称，默认使用deepseek-chat
+        :param model: 使用的模型名称，指定后覆盖路由结果；默认由模型路由按任务选择
+        :param router: ModelRouter，默认使用进程内共享的路由器
         """
         self.api_url = "https://llmapi.lcpu.dev/v1/chat/completions"
         self.api_key = "YOUR_API_KEY"
         self.model = model
+        self.router = router or default_router
 
-    def refine_text(self, text, style, style_reference="", prompt1=""):
+    def refine_text(self, text, style, style_reference="", prompt1="", shared_context="", task=None, tier="draft"):
         """
         调用文本处理API进行润色和风格调整，参考提供的文本风格
         :param text: 原始文本
         :param style: 目标风格描述
         :param style_reference: 参考文本风格内容
         :param prompt1: 调用时传入的自定义提示词
+        :param shared_context: 多个版本共用的背景内容（如活动规划方案），放入共享前缀
+        :param task: 任务名（如“短文本宣传语”），用于选择模型和生成参数
+        :param tier: "draft"起草或"upgrade"升级，质量控制不通过后重试时使用升级配置
         :return: 润色后的文本
         """
+        import requests
+
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}"
         }
-        common_prompt = f"请模仿以下文本风格进行润色，请保证格式清晰明了，风格描述：{style}\n参考文本风格内容：{style_reference}\n需要润色的文本：{text}"
-        full_prompt = prompt1 + "\n" + common_prompt if prompt1 else common_prompt
-        messages = [
-            {"role": "system", "content": "你是一个专业的文案润色助手。"},
-            {"role": "user", "content": full_prompt}
-        ]
+        messages = self._build_refine_messages(text, style, style_reference, prompt1, shared_context)
+        route = self.router.route(task, tier)
+        model = self.model or route["model"]
         data = {
-            "model": self.model,
+            "model": model,
             "messages": messages,
-            "max_tokens": 1000,
-            "temperature": 0.7
+            "max_tokens": route["max_tokens"],
+            "temperature": route["temperature"]
         }
+        usage, error, output = None, None, None
+        start = time.perf_counter()
         try:
             response = requests.post(self.api_url, headers=headers, json=data, timeout=300)
             if response.status_code == 200:
                 res_json = response.json()
+                usage = res_json.get("usage")
                 choices = res_json.get("choices", [])
                 if choices:
-                    return choices[0].get("message", {}).get("content", text)
+                    output = choices[0].get("message", {}).get("content", text)
+                    return output
                 else:
+                    error = "返回结果为空"
                     return text
             else:
+                error = f"状态码{response.status_code}"
                 print(f"文本处理API请求失败，状态码: {response.status_code}")
                 return text
         except requests.exceptions.RequestException as e:
+            error = str(e)
             print(f"文本处理API请求异常: {e}")
             return text
+        finally:
+            self.router.record(task, tier, model, time.perf_counter() - start, usage, error,
+                               json.dumps(messages, ensure_ascii=False), output)
+
+    def _build_refine_messages(self, text, style, style_reference="", prompt1="", shared_context=""):
+        """
+        构造润色请求的消息列表
+        system消息只包含同一次运行中各版本共用的内容（角色、风格描述、参考文本、共享背景），
+        且顺序固定，便于网关的前缀缓存命中；user消息只包含各版本不同的提示词和待润色文本。
+        :return: list，消息列表
+        """
+        shared_prefix = (
+            "你是一个专业的文案润色助手。请模仿以下文本风格进行润色，请保证格式清晰明了。\n"
+            f"风格描述：{style}\n"
+            f"参考文本风格内容：{style_reference}"
+        )
+        if shared_context:
+            shared_prefix += f"\n共享背景信息：{shared_context}"
+        variant_prompt = f"需要润色的文本：{text}"
+        if prompt1:
+            variant_prompt = prompt1 + "\n" + variant_prompt
+        return [
+            {"role": "system", "content": shared_prefix},
+            {"role": "user", "content": variant_prompt}
+        ]
 
 class RuleGenerationClient:
-    def __init__(self, model="deepseek-reasoner"):
+    def __init__(self, model=None, router=None):
         """
         初始化规则生成客户端，支持选择不同的LLM模型
-        :param model: 使用的模型名称，默认使用deepseek-reasoner
+        :param model: 使用的模型名称，指定后覆盖路由结果；默认由模型路由按活动类型选择
+                      （比赛类使用deepseek-reasoner，其他类型先用deepseek-chat）
+        :param router: ModelRouter，默认使用进程内共享的路由器
         """
         self.api_url = "https://llmapi.lcpu.dev/v1/chat/completions"
         self.api_key = "YOUR_API_KEY"
         self.model = model
+        self.router = router or default_router
 
-    def generate_rules(self, event_type, requirements):
+    def generate_rules(self, event_type, requirements, tier="draft"):
         """
         调用规则逻辑生成API，使用指定LLM模型生成规则文本
         :param event_type: 活动类型
         :param requirements: 规则需求描述
+        :param tier: "draft"起草或"upgrade"升级，质量控制不通过后重试时使用升级配置
         :return: 生成的规则文本
         """
+        import requests
+
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}"
@@ -166,24 +230,37 @@ class RuleGenerationClient:
             {"role": "system", "content": "你是一个专业的活动规则设计助手。"},
             {"role": "user", "content": f"请为活动类型'{event_type}'设计规则，要求如下：{requirements}"}
         ]
+        task = f"规则生成/{event_type}"
+        route = self.router.route(task, tier)
+        model = self.model or route["model"]
         data = {
-            "model": self.model,
+            "model": model,
             "messages": messages,
-            "max_tokens": 1000,
-            "temperature": 0.7
+            "max_tokens": route["max_tokens"],
+            "temperature": route["temperature"]
         }
+        usage, error, output = None, None, None
+        start = time.perf_counter()
         try:
             response = requests.post(self.api_url, headers=headers, json=data, timeout=300)
             if response.status_code == 200:
                 res_json = response.json()
+                usage = res_json.get("usage")
                 choices = res_json.get("choices", [])
                 if choices:
-                    return choices[0].get("message", {}).get("content", "")
+                    output = choices[0].get("message", {}).get("content", "")
+                    return output
                 else:
+                    error = "返回结果为空"
                     return ""
             else:
+                error = f"状态码{response.status_code}"
                 print(f"规则生成API请求失败，状态码: {response.status_code}")
                 return ""
         except requests.exceptions.RequestException as e:
+            error = str(e)
             print(f"规则生成API请求异常: {e}")
             return ""
+        finally:
+            self.router.record(task, tier, model, time.perf_counter() - start, usage, error,
+                               json.dumps(messages, ensure_ascii=False), output)
@@ -5,47 +5,224 @@
 确保系统整体输出的完整性和一致性。
 """
 
+import json
+import time
+from contextlib import contextmanager
+
+from event_planning_system.model_router import collect_calls
 from event_planning_system.demand_parser_agent import DemandParserAgent
 from event_planning_system.style_analysis_agent import StyleAnalysisAgent
-from event_planning_system.event_planning_agent import EventPlanningAgent
+from event_planning_system.event_planning_agent import RULE_REQUIREMENTS, EventPlanningAgent
 from event_planning_system.visual_design_agent import VisualDesignAgent
 from event_planning_system.copywriting_agent import CopywritingAgent
+from event_planning_system.quality_control import QualityController
 
 class CoordinatorAgent:
-    def __init__(self, reference_data_path):
+    def __init__(self, reference_data_path, image_worker=None):
+        """
+        :param reference_data_path: 参考资料根目录路径
+        :param image_worker: ImageWorkerPool，可选；传入时主视觉的图片后处理在进程池中执行
+        """
         self.demand_parser = DemandParserAgent()
         self.style_analyzer = StyleAnalysisAgent(reference_data_path)
-        self.event_planner = EventPlanningAgent()
-        self.visual_designer = VisualDesignAgent()
-        self.copywriter = CopywritingAgent()
+        self.event_planner = EventPlanningAgent(reference_data_path)
+        self.visual_designer = VisualDesignAgent(image_worker)
+        self.copywriter = CopywritingAgent(reference_data_path)
 
-    def run(self, input_text):
+    def run(self, input_text, sink=None, text_only=False, export_specs=None, prefetched=None, run_store=None, discarded=None):
         """
         运行整个多Agent协作流程
         :param input_text: 用户输入的非结构化活动需求文本
+        :param sink: ResultSink，可选；传入时每个阶段的产出在阶段结束后立即写出并释放内存，
+                     返回值中对应位置为产出的存储位置，运行结束时（包括失败）写出清单文件
+        :param text_only: bool，为True时跳过主视觉设计，整个流程不会导入PIL
+        :param export_specs: list，可选；传入时以同一张生成图片导出各渠道尺寸和格式的主视觉
+        :param prefetched: dict，可选；推测执行阶段已启动的任务（Future），键为"rules"或"base_visual"，
+                           调用方需保证这些任务所依赖的需求字段与本次解析结果一致；
+                           Future带有model_calls属性时，其中的模型调用记入本次运行
+        :param run_store: RunStore，可选；传入时运行结束（包括失败）后记录需求输入、解析结果、
+                          经质量控制后的最终文本产出、各阶段耗时和本次运行的模型调用
+        :param discarded: list，可选；被丢弃的推测任务（带model_calls属性的Future），其中的模型调用以tier为
+                          "discarded"记入本次运行；记录时仍在进行的调用无法记入
         :return: dict，包含完整的活动规划、主视觉设计（图片二进制）和宣传文案
         """
+        # outputs记录各阶段经质量控制后的最终文本，不依赖sink中可能被下次运行覆盖的文件
+        run_record = {"started_at": time.time(), "input_text": input_text, "stages": {}, "status": "成功", "outputs": {}}
+        start = time.perf_counter()
+        result = {}
+        # 本次运行（包括质量控制的并行重试）的模型调用只记入该列表，记录完成后随运行结束释放
+        calls = []
+        try:
+            with collect_calls(calls):
+                self._run_stages(input_text, sink, text_only, export_specs, prefetched, result, run_record, calls)
+            return result
+        except Exception as e:
+            run_record["status"] = "失败"
+            run_record["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            # 运行失败时也写出清单文件，记录已写出的部分产出
+            if sink is not None:
+                try:
+                    sink.close()
+                except Exception as e:
+                    print(f"写出清单文件失败: {e}")
+            run_record["total_seconds"] = time.perf_counter() - start
+            if run_store is not None:
+                try:
+                    discarded_calls = [dict(call, tier="discarded") for job in discarded or ()
+                                       for call in list(getattr(job, "model_calls", ()))]
+                    run_id = run_store.record_run(run_record, calls + discarded_calls)
+                    print(f"运行记录已保存（编号{run_id}）")
+                except Exception as e:
+                    print(f"保存运行记录失败: {e}")
+
+    def _run_stages(self, input_text, sink, text_only, export_specs, prefetched, result, run_record, calls):
+        """
+        依次执行各阶段，产出写入result，解析结果、质量报告和各阶段耗时写入run_record，
+        复用的推测任务中的模型调用追加到calls
+        """
         # 1. 需求解析与推断
-        demand_info = self.demand_parser.parse_and_infer(input_text)
+        with self._timed(run_record, "需求解析"):
+            demand_info = self.demand_parser.parse_and_infer(input_text)
+            run_record["demand_info"] = demand_info
+            self._emit_text(sink, result, "活动需求信息", demand_info)
 
         # 2. 风格分析
-        style_guide = self.style_analyzer.get_style_guide()
+        with self._timed(run_record, "风格分析"):
+            style_guide = self.style_analyzer.get_style_guide()
+
+        # 每次运行使用独立的质量控制器，各阶段产出先经本地检查，只对不合格的部分使用升级后的模型重新生成
+        quality_controller = QualityController()
+        run_record["quality_report"] = quality_controller.report
 
         # 3. 活动规划设计
-        event_plan = self.event_planner.design_event_plan(style_guide,demand_info)
+        activity_type = demand_info.get("活动类型", "")
+        with self._timed(run_record, "活动规划"):
+            rules = self._prefetched_result(prefetched, "rules", calls)
+            if rules is None:
+                rules = self.event_planner.generate_rules(activity_type)
+        if activity_type in RULE_REQUIREMENTS:
+            with self._timed(run_record, "质量控制"):
+                rules = quality_controller.review_rules(rules, lambda: self.event_planner.generate_rules(activity_type, "upgrade"))
+        with self._timed(run_record, "活动规划"):
+            event_plan = self.event_planner.design_event_plan(style_guide,demand_info, rules)
+        with self._timed(run_record, "质量控制"):
+            event_plan = quality_controller.review_texts(
+                "活动规划", event_plan,
+                {key: self.event_planner.source_text(key, demand_info, rules) for key in event_plan},
+                lambda key: self.event_planner.refine_part(key, style_guide, demand_info, rules, "upgrade")
+            )
+        with self._timed(run_record, "活动规划"):
+            self._emit_text(sink, result, "活动规划方案", event_plan)
+            run_record["outputs"]["活动规划方案"] = event_plan
 
         # 4. 主视觉设计
-        main_visual = self.visual_designer.generate_main_visual(style_guide, demand_info)
+        main_visual = None
+        if not text_only:
+            with self._timed(run_record, "主视觉设计"):
+                visual = {"base": self._prefetched_result(prefetched, "base_visual", calls)}
+                if visual["base"] is None:
+                    visual["base"] = self.visual_designer.generate_base_visual(style_guide, demand_info)
+                main_visual, overlay_ok = self.visual_designer.compose_main_visual_with_status(visual["base"], activity_type)
+
+            def regenerate_visual():
+                visual["base"] = self.visual_designer.generate_base_visual(style_guide, demand_info)
+                return self.visual_designer.compose_main_visual_with_status(visual["base"], activity_type)
+
+            with self._timed(run_record, "质量控制"):
+                main_visual = quality_controller.review_image(
+                    main_visual, overlay_ok,
+                    lambda: self.visual_designer.compose_main_visual_with_status(visual["base"], activity_type),
+                    regenerate_visual
+                )
+            with self._timed(run_record, "主视觉设计"):
+                if export_specs:
+                    exports = self.visual_designer.export_main_visual(visual["base"], activity_type, export_specs)
+                    result["主视觉导出"] = {}
+                    for name, exported in exports.items():
+                        if sink is not None:
+                            result["主视觉导出"][name] = sink.write_image(f"主视觉_{name}", exported["data"], exported["extension"])
+                        else:
+                            result["主视觉导出"][name] = exported
+                    del exports
+                del visual
+                # 图片只记录大小，运行记录中不保留图片数据
+                run_record["outputs"]["主视觉设计图片"] = f"<{len(main_visual)}字节>" if main_visual else None
+                if sink is not None and main_visual:
+                    main_visual = sink.write_image("主视觉设计", main_visual)
+        # 只生成文本时不记录主视觉设计阶段，避免耗时接近0的记录拉低该阶段的统计
+        result["主视觉设计图片"] = main_visual
+        del main_visual
 
         # 5. 文案创作
-        copywriting = self.copywriter.generate_copywriting(style_guide, demand_info, event_plan)
+        with self._timed(run_record, "文案创作"):
+            copywriting = self.copywriter.generate_copywriting(style_guide, demand_info, event_plan)
+        with self._timed(run_record, "质量控制"):
+            copywriting = quality_controller.review_texts(
+                "宣传文案", copywriting,
+                {key: self.copywriter.source_text(key, demand_info, event_plan) for key in copywriting},
+                lambda key: self.copywriter.regenerate_variant(key, style_guide, demand_info, event_plan, "upgrade")
+            )
+        with self._timed(run_record, "文案创作"):
+            if sink is not None:
+                result["宣传文案"] = {key: sink.write_text(f"宣传文案_{key}", content) for key, content in copywriting.items()}
+            else:
+                result["宣传文案"] = copywriting
+            run_record["outputs"]["宣传文案"] = copywriting
 
-        # 6. 质量控制与协调（简化示例，实际可扩展）
-        # 这里可以添加对输出内容的检查和修正逻辑
+        # 6. 质量控制与协调：汇总各阶段的检查结果和重试情况
+        with self._timed(run_record, "质量控制"):
+            result["质量控制报告"] = quality_controller.report
+            if sink is not None:
+                sink.write_text("质量控制报告", json.dumps(quality_controller.report, ensure_ascii=False, indent=2))
 
-        return {
-            "活动需求信息": demand_info,
-            "活动规划方案": event_plan,
-            "主视觉设计图片": main_visual,
-            "宣传文案": copywriting
-        }
+    def start_session(self, text_only=False):
+        """
+        创建推测执行会话，用于服务模式下在用户输入过程中提前启动部分阶段
+        :param text_only: bool，为True时不推测生成主视觉
+        :return: SpeculativeSession
+        """
+        from event_planning_system.speculative_session import SpeculativeSession
+
+        return SpeculativeSession(self, text_only=text_only)
+
+    def _prefetched_result(self, prefetched, key, calls):
+        """
+        取出推测执行任务的结果，并将任务中的模型调用追加到calls；
+        任务不存在或执行失败时返回None，由调用方重新执行该阶段
+        """
+        if not prefetched or key not in prefetched:
+            return None
+        try:
+            return prefetched[key].result()
+        except Exception as e:
+            print(f"推测执行任务{key}失败，重新执行: {e}")
+            return None
+        finally:
+            calls.extend(getattr(prefetched[key], "model_calls", ()))
+
+    @contextmanager
+    def _timed(self, run_record, stage):
+        """
+        记录一个阶段的耗时，阶段抛出异常时同时记录失败原因
+        同一阶段分多段执行时（如各阶段之间穿插的质量控制）耗时累加
+        """
+        timing = run_record["stages"].setdefault(stage, {"seconds": 0.0, "error": None})
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            timing["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            timing["seconds"] += time.perf_counter() - start
+
+    def _emit_text(self, sink, result, key, value):
+        """
+        记录文本类阶段产出：有sink时立即写出并只保留存储位置，否则保留原始内容
+        """
+        if sink is not None:
+            result[key] = sink.write_text(key, str(value))
+        else:
+            result[key] = value
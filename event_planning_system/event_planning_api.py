@@ -5,39 +5,87 @@
 并将结果保存到本地文件。
 """
 
-import os
-import base64
+import argparse
 
 from event_planning_system.coordinator_agent import CoordinatorAgent
+from event_planning_system.model_router import default_router
+from event_planning_system.result_sink import FileResultSink
 
 REFERENCE_DATA_PATH = "./数据集-推送"  # 参考资料路径，可根据实际调整
 
-def save_image(image_bytes, save_path):
+def parse_args(argv=None):
     """
-    保存图片二进制数据到文件
+    解析命令行参数
     """
-    with open(save_path, "wb") as f:
-        f.write(image_bytes)
-
-def save_text(text, save_path):
+    parser = argparse.ArgumentParser(description="大信科活动规划与宣传智能系统")
+    parser.add_argument("--text-only", action="store_true",
+                        help="只生成活动规划和宣传文案，跳过主视觉设计（不加载PIL）")
+    parser.add_argument("--image-workers", type=int, default=0,
+                        help="图片后处理进程池的工作进程数，0表示在主进程中处理")
+    parser.add_argument("--incremental", action="store_true",
+                        help="服务模式：逐行读取需求描述（空行结束），输入过程中提前启动已能确定的阶段")
+    parser.add_argument("--export", nargs="*", metavar="渠道",
+                        help="以同一张生成图片导出各渠道尺寸的主视觉；不指定渠道时导出全部默认规格"
+                             "（微信公众号封面、邮件横幅、社交媒体方图、印刷海报）")
+    parser.add_argument("--output-dir", default=".", help="输出文件的保存目录")
+    parser.add_argument("--run-db", default="event_planning_runs.db",
+                        help="运行历史SQLite数据库路径，设为空字符串时不记录；"
+                             "用 python -m event_planning_system.run_store report 查看耗时统计")
+    args = parser.parse_args(argv)
+    if args.export:
+        from event_planning_system.poster_export import DEFAULT_EXPORT_SPECS
+
+        # 渠道名称在解析后校验，避免启动时为校验参数导入导出模块
+        known_names = [spec["name"] for spec in DEFAULT_EXPORT_SPECS]
+        unknown_names = [name for name in args.export if name not in known_names]
+        if unknown_names:
+            parser.error(f"未知的导出渠道: {'、'.join(unknown_names)}（可选: {'、'.join(known_names)}）")
+    return args
+
+def read_incremental_input(session):
     """
-    保存文本内容到文件，自动将字符串中的转义换行符\n替换为真实换行
+    逐行读取需求描述，每读入一行即对目前为止的全部文本做一次增量解析
+    :param session: SpeculativeSession
+    :return: str，完整的需求文本
     """
-    import os
-    dir_path = os.path.dirname(save_path)
-    if dir_path and not os.path.exists(dir_path):
-        os.makedirs(dir_path)
-    with open(save_path, "w", encoding="utf-8") as f:
-        f.write(text.replace("\\n", "\n"))
-
-def main():
+    print("请输入活动需求描述（自然语言，可分多行输入，空行结束，输入exit退出）：")
+    lines = []
+    while True:
+        try:
+            line = input()
+        except EOFError:
+            break
+        if not line.strip():
+            break
+        if not lines and line.strip().lower() == "exit":
+            return line
+        lines.append(line)
+        session.update("\n".join(lines))
+    return "\n".join(lines)
+
+def main(argv=None):
+    args = parse_args(argv)
     print("欢迎使用大信科活动规划与宣传智能系统：\n")
-    input_text = input("请输入活动需求描述（自然语言，输入exit退出）：\n")
+
+    image_worker = None
+    if args.image_workers > 0 and not args.text_only:
+        from event_planning_system.image_worker import ImageWorkerPool
+        image_worker = ImageWorkerPool(args.image_workers)
+
+    coordinator = CoordinatorAgent(REFERENCE_DATA_PATH, image_worker)
+    session = None
+    if args.incremental:
+        session = coordinator.start_session(text_only=args.text_only)
+        input_text = read_incremental_input(session)
+    else:
+        input_text = input("请输入活动需求描述（自然语言，输入exit退出）：\n")
     if input_text.strip().lower() == "exit":
+        if session is not None:
+            session.close()
+        if image_worker is not None:
+            image_worker.close()
         print("退出程序。")
         return
-
-    coordinator = CoordinatorAgent(REFERENCE_DATA_PATH)
     print("系统正在处理，请稍候...（预计等待3-4分钟，调用外部API时间较长）")
 
     # 这里增加style_guide参数示例，实际可根据需求动态生成或传入
@@ -47,44 +95,37 @@ def main():
         }
     }
 
-    result = coordinator.run(input_text)
-
-    # 保存活动需求信息
-    demand_info_path = "output_活动需求信息.txt"
-    save_text(str(result["活动需求信息"]), demand_info_path)
-    print(f"活动需求信息已保存到 {demand_info_path}")
-
-    # 保存活动规划方案
-    event_plan_path = "output_活动规划方案.txt"
-    save_text(str(result["活动规划方案"]), event_plan_path)
-    print(f"活动规划方案已保存到 {event_plan_path}")
-
-    # 保存主视觉设计图片
-    if result["主视觉设计图片"]:
-        image_path = "output_主视觉设计.png"
-        save_image(result["主视觉设计图片"], image_path)
-        print(f"主视觉设计图片已保存到 {image_path}")
-    else:
+    export_specs = None
+    if args.export is not None and not args.text_only:
+        from event_planning_system.poster_export import DEFAULT_EXPORT_SPECS
+        export_specs = [spec for spec in DEFAULT_EXPORT_SPECS if not args.export or spec["name"] in args.export]
+
+    # 各阶段产出完成后立即写入本地文件，并在最后写出清单文件
+    sink = FileResultSink(args.output_dir)
+    run_store = None
+    if args.run_db:
+        from event_planning_system.run_store import RunStore
+        run_store = RunStore(args.run_db)
+    try:
+        if session is not None:
+            result = session.finalize(input_text, sink=sink, export_specs=export_specs, run_store=run_store)
+        else:
+            result = coordinator.run(input_text, sink=sink, text_only=args.text_only,
+                                     export_specs=export_specs, run_store=run_store)
+    finally:
+        if image_worker is not None:
+            image_worker.close()
+
+    if not args.text_only and not result["主视觉设计图片"]:
         print("主视觉设计图片生成失败。")
-
-    # 保存宣传文案
-    copywriting = result["宣传文案"]
-    for key, content in copywriting.items():
-        filename = f"output_宣传文案_{key}.txt"
-        save_text(content, filename)
-        print(f"{key}已保存到 {filename}")
-
-    # 如果有讲稿/主持词，单独保存
-    speech_key = "讲稿/主持词"
-    if speech_key in copywriting:
-        speech_filename = f"output_宣传文案_{speech_key}.txt"
-        # 确保目录存在
-        import os
-        dir_path = os.path.dirname(speech_filename)
-        if dir_path and not os.path.exists(dir_path):
-            os.makedirs(dir_path)
-        save_text(copywriting[speech_key], speech_filename)
-        print(f"{speech_key}已保存到 {speech_filename}")
+    for key, save_path in sink.manifest.items():
+        print(f"{key}已保存到 {save_path}")
+
+    # 各任务模型调用的耗时和token用量，用于调整模型路由配置
+    print("模型调用统计：")
+    for group in default_router.summary():
+        print(f"  {group['task']}（{group['model']}）：{group['calls']}次，平均{group['avg_seconds']:.1f}秒，"
+              f"输入{group['prompt_tokens']}/输出{group['completion_tokens']} tokens，缓存命中{group['cache_hit_tokens']} tokens")
 
     print("所有输出已完成。")
 
@@ -0,0 +1,263 @@
+"""
+图片后处理进程池模块
+将叠加合成、PNG编码、素材加载等CPU密集的PIL操作放到独立的进程池中执行，
+避免在多线程流程中占用GIL、阻塞调用外部API的文本阶段。
+叠加素材（logo、吉祥物等）在主进程解码一次后放入共享内存，工作进程直接按像素缓冲区重建图片，
+解码后的像素数据不会经过pickle在进程间复制。
+"""
+
+import io
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+def paste_overlay(base_img, overlay_img, scale=0.2, position="bottom_right"):
+    """
+    按比例缩放叠加图片并透明粘贴到基底图片的指定位置
+
+    :param base_img: PIL.Image对象，基底图片，必须为RGBA模式
+    :param overlay_img: PIL.Image对象，叠加图片
+    :param scale: float，叠加图片相对于基底图片宽度的缩放比例，范围0~1
+    :param position: str，叠加位置，支持 "top_left", "top_right", "bottom_left", "bottom_right"
+    """
+    overlay_width = int(base_img.width * scale)
+    overlay_img = scale_sprite(overlay_img, overlay_width)
+    base_img.paste(overlay_img, overlay_position(base_img.size, overlay_img.size, position), overlay_img)
+
+def scale_sprite(overlay_img, overlay_width):
+    """
+    按目标宽度等比缩放叠加图片
+    :param overlay_img: PIL.Image对象，叠加图片
+    :param overlay_width: int，目标宽度
+    :return: PIL.Image对象，RGBA模式的缩放后图片
+    """
+    from PIL import Image
+
+    overlay_height = int(overlay_img.height * (overlay_width / overlay_img.width))
+    return overlay_img.resize((overlay_width, overlay_height), Image.Resampling.LANCZOS).convert("RGBA")
+
+def overlay_position(base_size, overlay_size, position="bottom_right", margin=10):
+    """
+    计算叠加图片在基底图片上的左上角坐标
+    :param base_size: tuple，基底图片(宽, 高)
+    :param overlay_size: tuple，叠加图片(宽, 高)
+    :param position: str，叠加位置，支持 "top_left", "top_right", "bottom_left", "bottom_right"
+    :param margin: int，距边缘的像素数
+    :return: tuple，(x, y)
+    """
+    base_width, base_height = base_size
+    overlay_width, overlay_height = overlay_size
+    if position == "top_left":
+        return (margin, margin)
+    elif position == "top_right":
+        return (base_width - overlay_width - margin, margin)
+    elif position == "bottom_left":
+        return (margin, base_height - overlay_height - margin)
+    else:  # bottom_right
+        return (base_width - overlay_width - margin, base_height - overlay_height - margin)
+
+# 工作进程内缩放后素材的缓存，键为(共享内存名称, 目标宽度)
+_scaled_sprite_cache = {}
+
+def read_shared_bytes(shm_name, length):
+    """
+    从共享内存中读取指定长度的数据
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        return bytes(shm.buf[:length])
+    finally:
+        shm.close()
+
+def shared_sprite(sprite, overlay_width):
+    """
+    工作进程中获取指定宽度的叠加素材
+    直接在共享内存的像素缓冲区上构造图片，缩放后的结果在本进程内缓存
+    :param sprite: dict，素材描述（shm_name、mode、size）
+    :param overlay_width: int，目标宽度
+    :return: PIL.Image对象，RGBA模式的缩放后图片
+    """
+    from PIL import Image
+
+    key = (sprite["shm_name"], overlay_width)
+    if key not in _scaled_sprite_cache:
+        sprite_shm = shared_memory.SharedMemory(name=sprite["shm_name"])
+        try:
+            overlay_img = Image.frombuffer(sprite["mode"], tuple(sprite["size"]), sprite_shm.buf, "raw", sprite["mode"], 0, 1)
+            _scaled_sprite_cache[key] = scale_sprite(overlay_img, overlay_width)
+            del overlay_img
+        finally:
+            sprite_shm.close()
+    return _scaled_sprite_cache[key]
+
+def _composite_job(base_shm_name, base_length, layers):
+    """
+    工作进程中执行的叠加合成任务
+    :param base_shm_name: str，存放基底图片（编码后数据）的共享内存名称
+    :param base_length: int，基底图片数据长度
+    :param layers: list，每项为(素材描述dict, scale, position)，素材描述包含shm_name、mode、size
+    :return: bytes，叠加后的PNG图片二进制数据
+    """
+    from PIL import Image
+
+    base_img_data = read_shared_bytes(base_shm_name, base_length)
+    with Image.open(io.BytesIO(base_img_data)) as base_img:
+        base_img = base_img.convert("RGBA")
+        for sprite, scale, position in layers:
+            overlay_img = shared_sprite(sprite, int(base_img.width * scale))
+            base_img.paste(overlay_img, overlay_position(base_img.size, overlay_img.size, position), overlay_img)
+
+        with io.BytesIO() as output:
+            base_img.save(output, format="PNG")
+            return output.getvalue()
+
+def _load_png_job(filepath):
+    """
+    工作进程中执行的素材加载任务，将图片转换为PNG格式的二进制数据
+    :param filepath: str，图片文件路径
+    :return: bytes，PNG格式图片的二进制数据；加载失败时返回None
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(filepath) as img:
+            with io.BytesIO() as output:
+                img.convert("RGBA").save(output, format="PNG")
+                return output.getvalue()
+    except Exception as e:
+        print(f"加载图片{filepath}失败: {e}")
+        return None
+
+class ImageWorkerPool:
+    def __init__(self, max_workers=None):
+        """
+        :param max_workers: 工作进程数，默认使用CPU核数
+        """
+        self.max_workers = max_workers
+        self._executor = None
+        self._sprites = {}
+        self._lock = threading.Lock()
+
+    def composite(self, base_img_data, layers):
+        """
+        在进程池中完成叠加合成，阻塞等待结果
+        :param base_img_data: bytes，生成图片的二进制数据
+        :param layers: list，每项为(叠加图片路径, scale, position)
+        :return: bytes，叠加后的PNG图片二进制数据
+        """
+        return self.submit_shared(_composite_job, base_img_data, layers)[0].result()
+
+    def submit_shared(self, job, base_img_data, layers, job_args=((),)):
+        """
+        以共享内存方式提交一组基于同一张基底图片的任务到进程池
+        基底图片只写入一块临时共享内存，全部任务完成后自动释放；叠加素材使用常驻共享内存
+        :param job: 模块级函数，签名为job(base_shm_name, base_length, shared_layers, *args)
+        :param base_img_data: bytes，生成图片的二进制数据
+        :param layers: list，每项为(叠加图片路径, scale, position)
+        :param job_args: list，每项为一个任务的额外参数元组
+        :return: List[concurrent.futures.Future]，与job_args一一对应
+        """
+        if not job_args:
+            return []
+
+        shared_layers = []
+        for overlay_path, scale, position in layers:
+            sprite = self.share_sprite(overlay_path)
+            if sprite is not None:
+                shared_layers.append((sprite, scale, position))
+
+        base_shm = shared_memory.SharedMemory(create=True, size=max(len(base_img_data), 1))
+        base_shm.buf[:len(base_img_data)] = base_img_data
+        pending = [len(job_args)]
+        pending_lock = threading.Lock()
+
+        def release(_):
+            with pending_lock:
+                pending[0] -= 1
+                if pending[0] == 0:
+                    self._release_shared_memory(base_shm)
+
+        futures = []
+        try:
+            executor = self._get_executor()
+            for args in job_args:
+                futures.append(executor.submit(job, base_shm.name, len(base_img_data), shared_layers, *args))
+        except Exception:
+            for future in futures:
+                future.cancel()
+            self._release_shared_memory(base_shm)
+            raise
+        for future in futures:
+            future.add_done_callback(release)
+        return futures
+
+    def load_images(self, file_paths):
+        """
+        在进程池中并行加载图片并转换为PNG格式的二进制数据
+        :param file_paths: list，图片文件路径列表
+        :return: List[bytes] 加载成功的PNG格式图片二进制数据列表
+        """
+        if not file_paths:
+            return []
+        results = self._get_executor().map(_load_png_job, file_paths)
+        return [data for data in results if data is not None]
+
+    def close(self):
+        """
+        关闭进程池并释放全部共享内存
+        """
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            for shm, _ in self._sprites.values():
+                self._release_shared_memory(shm)
+            self._sprites.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # 使用spawn方式启动工作进程，避免在多线程进程中fork
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def share_sprite(self, overlay_path):
+        """
+        将叠加素材解码为RGBA像素后放入共享内存，同一路径只解码一次
+        :param overlay_path: str，叠加图片文件路径
+        :return: dict，素材描述（shm_name、mode、size）；加载失败时返回None
+        """
+        from PIL import Image
+
+        with self._lock:
+            if overlay_path not in self._sprites:
+                try:
+                    with Image.open(overlay_path) as overlay_img:
+                        overlay_img = overlay_img.convert("RGBA")
+                        pixels = overlay_img.tobytes()
+                        shm = shared_memory.SharedMemory(create=True, size=len(pixels))
+                        shm.buf[:len(pixels)] = pixels
+                        sprite = {"shm_name": shm.name, "mode": "RGBA", "size": overlay_img.size}
+                        self._sprites[overlay_path] = (shm, sprite)
+                except Exception as e:
+                    print(f"叠加图片失败({overlay_path}): {e}")
+                    return None
+            return self._sprites[overlay_path][1]
+
+    @staticmethod
+    def _release_shared_memory(shm):
+        try:
+            shm.close()
+            shm.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,82 @@
+"""
+导入耗时基准模块
+使用 python -X importtime 在独立子进程中测量主接口模块的导入耗时，
+检查是否超出预算，以及是否在启动阶段提前加载了重量级依赖（PIL、requests、python-docx）。
+
+运行方法（在项目根目录下）：
+    python -m event_planning_system.import_benchmark --budget-ms 50
+"""
+
+import argparse
+import subprocess
+import sys
+
+DEFAULT_MODULE = "event_planning_system.event_planning_api"
+DEFAULT_BUDGET_MS = 50
+# 启动阶段不应导入的重量级依赖，只在对应阶段实际运行时才加载
+LAZY_MODULES = ("PIL", "requests", "docx")
+
+def measure_import_time(module=DEFAULT_MODULE):
+    """
+    在子进程中导入指定模块，解析 -X importtime 的输出
+    :param module: str，被测模块名
+    :return: dict，键为模块名，值为(自身耗时us, 累计耗时us)
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"导入模块 {module} 失败:\n{completed.stderr}")
+
+    timings = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        self_us, cumulative_us, name = fields
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+def check_import_budget(module=DEFAULT_MODULE, budget_ms=DEFAULT_BUDGET_MS, top=10):
+    """
+    检查导入耗时是否在预算内，并打印耗时最长的若干模块
+    :param module: str，被测模块名
+    :param budget_ms: float，累计导入耗时预算（毫秒）
+    :param top: int，打印的最耗时模块数量
+    :return: bool，是否通过检查
+    """
+    timings = measure_import_time(module)
+    total_ms = timings.get(module, (0, 0))[1] / 1000
+    passed = True
+
+    print(f"{module} 累计导入耗时: {total_ms:.1f}ms（预算 {budget_ms}ms）")
+    if total_ms > budget_ms:
+        print("导入耗时超出预算！")
+        passed = False
+
+    eager_modules = sorted({name.split(".")[0] for name in timings} & set(LAZY_MODULES))
+    if eager_modules:
+        print(f"启动阶段提前导入了重量级依赖: {', '.join(eager_modules)}")
+        passed = False
+
+    print(f"自身耗时最长的{top}个模块：")
+    slowest = sorted(timings.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"  {self_us / 1000:8.2f}ms  (累计 {cumulative_us / 1000:8.2f}ms)  {name}")
+
+    return passed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="测量模块导入耗时并检查启动预算")
+    parser.add_argument("--module", default=DEFAULT_MODULE, help="被测模块名")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="累计导入耗时预算（毫秒）")
+    parser.add_argument("--top", type=int, default=10, help="打印的最耗时模块数量")
+    args = parser.parse_args(argv)
+    passed = check_import_budget(args.module, args.budget_ms, args.top)
+    sys.exit(0 if passed else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+模型路由模块
+按任务从配置表中选择模型和生成参数：短文本等简单任务使用快速模型，比赛规则设计使用推理模型；
+支持“先用快速模型起草，质量控制不通过时再升级”的分级生成，
+并按(任务, 模型)汇总调用耗时和token用量，便于根据数据调整路由配置；
+单次运行的完整调用记录（含提示词和输出）只保存在该运行的调用收集器中。
+"""
+
+import threading
+import contextvars
+from contextlib import contextmanager
+
+FAST_MODEL = "deepseek-chat"
+REASONING_MODEL = "deepseek-reasoner"
+
+# 当前运行的调用收集器，由collect_calls设置；在线程池中执行的调用需以contextvars.copy_context()传递
+_call_collector = contextvars.ContextVar("model_call_collector", default=None)
+
+@contextmanager
+def collect_calls(calls=None):
+    """
+    收集with块内（同一上下文中）发生的全部模型调用记录，用于按运行记录调用明细
+    :param calls: list，可选；调用记录追加到该列表，默认新建
+    :return: list，调用记录列表，每项包含任务、级别、模型、耗时、token用量、错误、提示词和输出
+    """
+    calls = [] if calls is None else calls
+    token = _call_collector.set(calls)
+    try:
+        yield calls
+    finally:
+        _call_collector.reset(token)
+
+# 路由配置表：任务名 -> 各级别（draft起草 / upgrade升级）的模型和生成参数
+# 任务名可带“/”细分（如“规则生成/比赛类”），查找不到时依次回退到“/”前的任务名和“默认”
+MODEL_ROUTES = {
+    "默认": {
+        "draft": {"model": FAST_MODEL, "max_tokens": 1000, "temperature": 0.7},
+        "upgrade": {"model": REASONING_MODEL, "max_tokens": 2000, "temperature": 0.7},
+    },
+    "短文本宣传语": {
+        "draft": {"model": FAST_MODEL, "max_tokens": 400, "temperature": 0.8},
+        "upgrade": {"model": REASONING_MODEL, "max_tokens": 1500, "temperature": 0.8},
+    },
+    "社交媒体分享版本": {
+        "draft": {"model": FAST_MODEL, "max_tokens": 800, "temperature": 0.8},
+        "upgrade": {"model": REASONING_MODEL, "max_tokens": 2000, "temperature": 0.8},
+    },
+    "邮件通知版本": {
+        "draft": {"model": FAST_MODEL, "max_tokens": 1000, "temperature": 0.5},
+        "upgrade": {"model": REASONING_MODEL, "max_tokens": 2000, "temperature": 0.5},
+    },
+    "微信公众号推送稿": {
+        "draft": {"model": FAST_MODEL, "max_tokens": 1500, "temperature": 0.7},
+        "upgrade": {"model": REASONING_MODEL, "max_tokens": 3000, "temperature": 0.7},
+    },
+    "讲稿/主持词": {
+        "draft": {"model": FAST_MODEL, "max_tokens": 1500, "temperature": 0.7},
+        "upgrade": {"model": REASONING_MODEL, "max_tokens": 3000, "temperature": 0.7},
+    },
+    "润色后的活动规划方案": {
+        "draft": {"model": FAST_MODEL, "max_tokens": 1500, "temperature": 0.5},
+        "upgrade": {"model": REASONING_MODEL, "max_tokens": 3000, "temperature": 0.5},
+    },
+    # 讲座、晚会等流程设计较简单，先用快速模型；比赛规则和评分标准需要推理模型
+    "规则生成": {
+        "draft": {"model": FAST_MODEL, "max_tokens": 1000, "temperature": 0.7},
+        "upgrade": {"model": REASONING_MODEL, "max_tokens": 2000, "temperature": 0.7},
+    },
+    "规则生成/比赛类": {
+        "draft": {"model": REASONING_MODEL, "max_tokens": 2000, "temperature": 0.7},
+        "upgrade": {"model": REASONING_MODEL, "max_tokens": 4000, "temperature": 0.7},
+    },
+}
+
+class ModelRouter:
+    def __init__(self, routes=None):
+        """
+        :param routes: dict，路由配置表，默认使用MODEL_ROUTES
+        """
+        self.routes = routes if routes is not None else MODEL_ROUTES
+        self._groups = {}
+        self._lock = threading.Lock()
+
+    def route(self, task=None, tier="draft"):
+        """
+        查找任务对应的模型和生成参数
+        :param task: str，任务名，None表示使用默认配置
+        :param tier: str，"draft"起草或"upgrade"升级
+        :return: dict，包含model、max_tokens、temperature
+        """
+        candidates = []
+        if task:
+            candidates.append(task)
+            if "/" in task:
+                candidates.append(task.split("/", 1)[0])
+        candidates.append("默认")
+        for name in candidates:
+            if name in self.routes:
+                tiers = self.routes[name]
+                return dict(tiers.get(tier) or tiers["draft"])
+        raise KeyError(f"路由配置中缺少默认配置: {tier}")
+
+    def record(self, task, tier, model, seconds, usage=None, error=None, prompt=None, output=None):
+        """
+        记录一次模型调用：耗时和token用量累加到(任务, 模型)汇总中，
+        完整记录（含提示词和输出）只追加到当前运行的调用收集器（见collect_calls）
+        :param task: str，任务名
+        :param tier: str，调用级别
+        :param model: str，实际使用的模型
+        :param seconds: float，调用耗时（秒）
+        :param usage: dict，API返回的usage字段
+        :param error: str，失败原因，成功时为None
+        :param prompt: str，发送给模型的提示词
+        :param output: str，模型返回的内容
+        :return: dict，本次调用的记录
+        """
+        usage = usage or {}
+        entry = {
+            "task": task or "默认",
+            "tier": tier,
+            "model": model,
+            "seconds": seconds,
+            "prompt_tokens": usage.get("prompt_tokens") or 0,
+            "completion_tokens": usage.get("completion_tokens") or 0,
+            "cache_hit_tokens": usage.get("prompt_cache_hit_tokens") or 0,
+            "error": error,
+            "prompt": prompt,
+            "output": output,
+        }
+        with self._lock:
+            group = self._groups.setdefault((entry["task"], entry["model"]), {
+                "task": entry["task"], "model": entry["model"], "calls": 0, "errors": 0,
+                "total_seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0, "cache_hit_tokens": 0,
+            })
+            group["calls"] += 1
+            group["errors"] += 1 if error else 0
+            group["total_seconds"] += seconds
+            for field in ("prompt_tokens", "completion_tokens", "cache_hit_tokens"):
+                group[field] += entry[field]
+        calls = _call_collector.get()
+        if calls is not None:
+            calls.append(entry)
+        return entry
+
+    def summary(self):
+        """
+        按(任务, 模型)汇总调用次数、平均耗时和token用量
+        :return: list，每项为一个(任务, 模型)的汇总dict
+        """
+        with self._lock:
+            groups = [dict(group) for group in self._groups.values()]
+        for group in groups:
+            group["avg_seconds"] = group["total_seconds"] / group["calls"]
+        return sorted(groups, key=lambda group: group["total_seconds"], reverse=True)
+
+# 进程内共享的默认路由器，各API客户端未指定路由器时使用
+default_router = ModelRouter()
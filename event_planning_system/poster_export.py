@@ -0,0 +1,143 @@
+"""
+主视觉多尺寸导出模块
+以一次生成的主视觉基底图片为输入，按各发布渠道（公众号封面、邮件横幅、社交媒体方图、印刷海报等）
+的尺寸和格式批量导出衍生图片，叠加素材按各尺寸重新定位和缩放，
+避免为每个渠道重新调用图片生成API或手动调整尺寸。
+"""
+
+import io
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+from event_planning_system.image_worker import overlay_position, read_shared_bytes, scale_sprite, shared_sprite
+
+# 默认导出规格：name为渠道名称，size为(宽, 高)，format支持PNG、WEBP、JPEG（渐进式）
+DEFAULT_EXPORT_SPECS = [
+    {"name": "微信公众号封面", "size": (900, 383), "format": "JPEG"},
+    {"name": "邮件横幅", "size": (1200, 400), "format": "PNG"},
+    {"name": "社交媒体方图", "size": (1080, 1080), "format": "WEBP"},
+    {"name": "印刷海报", "size": (2480, 3508), "format": "PNG"},
+]
+
+# 各格式对应的文件扩展名和编码参数
+FORMAT_OPTIONS = {
+    "PNG": ("png", {}),
+    "WEBP": ("webp", {"quality": 90, "method": 4}),
+    "JPEG": ("jpg", {"quality": 90, "progressive": True, "optimize": True}),
+}
+
+def encode_image(img, image_format):
+    """
+    按指定格式编码图片
+    :param img: PIL.Image对象
+    :param image_format: str，PNG、WEBP或JPEG
+    :return: bytes，编码后的图片二进制数据
+    """
+    _, options = FORMAT_OPTIONS[image_format]
+    if image_format == "JPEG":
+        img = img.convert("RGB")
+    with io.BytesIO() as output:
+        img.save(output, format=image_format, **options)
+        return output.getvalue()
+
+def render_derivative(base_img, spec, layers, get_sprite):
+    """
+    根据导出规格生成一张衍生图片
+    基底图片按目标尺寸居中裁剪缩放，叠加素材的宽度按目标尺寸短边的比例计算，保证横幅和竖版海报上比例协调
+    :param base_img: PIL.Image对象，RGBA模式的基底图片（未叠加素材）
+    :param spec: dict，导出规格，包含name、size、format，可选overlay_scale覆盖默认缩放比例
+    :param layers: list，每项为(素材键, scale, position)
+    :param get_sprite: 函数，get_sprite(素材键, 目标宽度)返回缩放后的RGBA素材图片，失败时返回None
+    :return: bytes，编码后的衍生图片二进制数据
+    """
+    from PIL import Image, ImageOps
+
+    canvas = ImageOps.fit(base_img, tuple(spec["size"]), Image.Resampling.LANCZOS)
+    for sprite_key, scale, position in layers:
+        overlay_width = max(int(min(canvas.size) * spec.get("overlay_scale", scale)), 1)
+        overlay_img = get_sprite(sprite_key, overlay_width)
+        if overlay_img is None:
+            continue
+        canvas.paste(overlay_img, overlay_position(canvas.size, overlay_img.size, position), overlay_img)
+    return encode_image(canvas, spec["format"])
+
+@lru_cache(maxsize=16)
+def _load_sprite(overlay_path):
+    """
+    读取并解码叠加素材，同一进程内每个文件只解码一次
+    """
+    from PIL import Image
+
+    with Image.open(overlay_path) as overlay_img:
+        return overlay_img.convert("RGBA")
+
+@lru_cache(maxsize=64)
+def _scaled_sprite(overlay_path, overlay_width):
+    """
+    获取指定宽度的叠加素材，缩放结果按(路径, 宽度)缓存
+    """
+    try:
+        return scale_sprite(_load_sprite(overlay_path), overlay_width)
+    except Exception as e:
+        print(f"叠加图片失败({overlay_path}): {e}")
+        return None
+
+def _export_job(base_shm_name, base_length, shared_layers, spec):
+    """
+    工作进程中执行的导出任务，基底图片和叠加素材都从共享内存读取
+    """
+    from PIL import Image
+
+    base_img_data = read_shared_bytes(base_shm_name, base_length)
+    sprites = {sprite["shm_name"]: sprite for sprite, _, _ in shared_layers}
+    layers = [(sprite["shm_name"], scale, position) for sprite, scale, position in shared_layers]
+    with Image.open(io.BytesIO(base_img_data)) as base_img:
+        base_img = base_img.convert("RGBA")
+        return render_derivative(base_img, spec, layers, lambda name, width: shared_sprite(sprites[name], width))
+
+class PosterExporter:
+    def __init__(self, specs=None, image_worker=None, max_workers=None):
+        """
+        :param specs: list，导出规格列表，默认使用DEFAULT_EXPORT_SPECS
+        :param image_worker: ImageWorkerPool，可选；传入时导出任务在进程池中执行
+        :param max_workers: 未使用进程池时的线程数，PIL的缩放和编码会释放GIL
+        """
+        self.specs = specs if specs is not None else DEFAULT_EXPORT_SPECS
+        self.image_worker = image_worker
+        self.max_workers = max_workers
+
+    def export(self, base_img_data, layers):
+        """
+        以同一张基底图片并行导出全部规格的衍生图片
+        :param base_img_data: bytes，生成的主视觉基底图片二进制数据（未叠加素材）
+        :param layers: list，每项为(叠加图片路径, scale, position)
+        :return: dict，键为规格名称，值为{"data": bytes, "extension": str}；导出失败的规格不包含在内
+        """
+        if not base_img_data or not self.specs:
+            return {}
+
+        if self.image_worker is not None:
+            futures = self.image_worker.submit_shared(_export_job, base_img_data, layers, [(spec,) for spec in self.specs])
+            results = [self._collect(spec, future.result) for spec, future in zip(self.specs, futures)]
+        else:
+            from PIL import Image
+
+            with Image.open(io.BytesIO(base_img_data)) as base_img:
+                # 先完成解码，之后各线程只读共享同一份像素数据
+                base_img = base_img.convert("RGBA")
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(render_derivative, base_img, spec, layers, _scaled_sprite) for spec in self.specs]
+                results = [self._collect(spec, future.result) for spec, future in zip(self.specs, futures)]
+
+        return {spec["name"]: data for spec, data in zip(self.specs, results) if data is not None}
+
+    def _collect(self, spec, get_result):
+        """
+        取出单个规格的导出结果，失败时打印错误并返回None
+        """
+        try:
+            extension, _ = FORMAT_OPTIONS[spec["format"]]
+            return {"data": get_result(), "extension": extension}
+        except Exception as e:
+            print(f"导出{spec['name']}失败: {e}")
+            return None
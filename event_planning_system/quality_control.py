@@ -0,0 +1,191 @@
+"""
+质量控制模块
+对各阶段产出先做快速的本地检查（长度范围、必需段落、API失败时原样返回的文本、
+图片提示词中的禁用字符、图片尺寸和素材叠加是否成功），
+只对不合格的部分并行地重新生成，避免整条流程重跑。
+"""
+
+import io
+
+# 各文本产出的检查规则：长度范围（字符数）和必须出现的段落标题
+TEXT_CHECKS = {
+    "润色后的需求信息": {"min_length": 50, "max_length": 4000, "required_sections": ["活动需求信息汇总"]},
+    "润色后的活动规划方案": {"min_length": 100, "max_length": 6000, "required_sections": ["活动规划方案"]},
+    "微信公众号推送稿": {"min_length": 200, "max_length": 6000},
+    "邮件通知版本": {"min_length": 100, "max_length": 4000},
+    "短文本宣传语": {"min_length": 10, "max_length": 1000},
+    "社交媒体分享版本": {"min_length": 50, "max_length": 3000},
+    "讲稿/主持词": {"min_length": 200, "max_length": 6000},
+}
+
+RULES_MIN_LENGTH = 20  # 规则生成结果的最短长度
+EXPECTED_IMAGE_SIZE = (1024, 1024)  # 主视觉图片的预期尺寸
+# 图片提示词中不允许出现的字符，容易被图片生成模型当作字面文字画进图片
+BANNED_PROMPT_CHARACTERS = set("<>{}[]|\\`#$^*~\"")
+
+def check_text(text, source_text=None, min_length=0, max_length=None, required_sections=()):
+    """
+    检查文本产出
+    :param text: str，待检查文本
+    :param source_text: str，润色前的基础文本；产出与其相同说明文本处理API失败后原样返回
+    :param min_length: int，最短长度
+    :param max_length: int，最长长度，None表示不限制
+    :param required_sections: list，必须出现的段落标题
+    :return: list，问题描述列表，为空表示通过
+    """
+    if not text or not text.strip():
+        return ["内容为空"]
+    issues = []
+    if source_text is not None and text.strip() == source_text.strip():
+        issues.append("与润色前的文本相同，文本处理API可能调用失败")
+    if len(text) < min_length:
+        issues.append(f"长度{len(text)}小于下限{min_length}")
+    if max_length is not None and len(text) > max_length:
+        issues.append(f"长度{len(text)}超过上限{max_length}")
+    for section in required_sections:
+        if section not in text:
+            issues.append(f"缺少段落“{section}”")
+    return issues
+
+def check_rules(rules):
+    """
+    检查规则生成结果
+    :return: list，问题描述列表
+    """
+    if not rules or not rules.strip():
+        return ["规则生成结果为空"]
+    if len(rules.strip()) < RULES_MIN_LENGTH:
+        return [f"规则生成结果过短（{len(rules.strip())}字）"]
+    return []
+
+def check_image_prompt(prompt):
+    """
+    检查图片生成提示词中的禁用字符和控制字符
+    :return: list，问题描述列表
+    """
+    banned = sorted({ch for ch in prompt if ch in BANNED_PROMPT_CHARACTERS or (ord(ch) < 32 and ch != "\n")})
+    if banned:
+        return [f"包含禁用字符: {' '.join(repr(ch) for ch in banned)}"]
+    return []
+
+def sanitize_image_prompt(prompt):
+    """
+    去除图片生成提示词中的禁用字符和控制字符
+    """
+    return "".join(ch for ch in prompt if ch not in BANNED_PROMPT_CHARACTERS and (ord(ch) >= 32 or ch == "\n"))
+
+def check_image(image_bytes, expected_size=EXPECTED_IMAGE_SIZE, overlay_ok=True):
+    """
+    检查主视觉图片，只读取图片头信息获取尺寸，不解码像素
+    :param image_bytes: bytes，图片二进制数据
+    :param expected_size: tuple，预期尺寸(宽, 高)
+    :param overlay_ok: bool，素材叠加是否全部成功
+    :return: list，问题描述列表
+    """
+    if not image_bytes:
+        return ["图片生成失败"]
+    from PIL import Image
+
+    issues = []
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            if img.size != tuple(expected_size):
+                issues.append(f"图片尺寸{img.size[0]}x{img.size[1]}与预期{expected_size[0]}x{expected_size[1]}不符")
+    except Exception as e:
+        return [f"图片无法解析: {e}"]
+    if not overlay_ok:
+        issues.append("logo等素材叠加失败")
+    return issues
+
+class QualityController:
+    def __init__(self, max_workers=5):
+        """
+        :param max_workers: 并行重新生成的最大线程数
+        """
+        self.max_workers = max_workers
+        self.report = {}
+
+    def review_texts(self, stage, outputs, source_texts, regenerate):
+        """
+        检查一组文本产出，只对不合格的部分并行重新生成一次
+        重新生成的结果问题更少时替换原结果，否则保留原结果
+        :param stage: str，阶段名称，用于质量报告
+        :param outputs: dict，产出名称到文本的映射
+        :param source_texts: dict，产出名称到润色前基础文本的映射
+        :param regenerate: 函数，regenerate(产出名称)返回重新生成的文本
+        :return: dict，检查和重试后的产出
+        """
+        def check(key, text):
+            return check_text(text, source_texts.get(key), **TEXT_CHECKS.get(key, {}))
+
+        issues = {key: check(key, text) for key, text in outputs.items()}
+        failed = [key for key, key_issues in issues.items() if key_issues]
+        regenerated = self._run_parallel(regenerate, failed)
+
+        reviewed = dict(outputs)
+        for key in outputs:
+            entry = {"问题": issues[key], "已重试": key in failed}
+            if key in regenerated:
+                retry_issues = check(key, regenerated[key])
+                entry["重试后问题"] = retry_issues
+                if len(retry_issues) < len(issues[key]):
+                    reviewed[key] = regenerated[key]
+            self.report[f"{stage}/{key}"] = entry
+        return reviewed
+
+    def review_rules(self, rules, regenerate):
+        """
+        检查规则生成结果，不合格时重新生成一次
+        :param rules: str，规则文本
+        :param regenerate: 函数，无参数，返回重新生成的规则文本
+        :return: str，检查和重试后的规则文本
+        """
+        issues = check_rules(rules)
+        entry = {"问题": issues, "已重试": bool(issues)}
+        if issues:
+            retried = regenerate()
+            entry["重试后问题"] = check_rules(retried)
+            if len(entry["重试后问题"]) < len(issues):
+                rules = retried
+        self.report["活动规划/规则生成"] = entry
+        return rules
+
+    def review_image(self, image_bytes, overlay_ok, recompose, regenerate):
+        """
+        检查主视觉图片：只有素材叠加失败时重新叠加（本地操作），图片缺失或尺寸不符时才重新调用图片生成API
+        :param image_bytes: bytes，主视觉图片
+        :param overlay_ok: bool，素材叠加是否全部成功
+        :param recompose: 函数，无参数，返回(图片, 叠加是否成功)
+        :param regenerate: 函数，无参数，返回(图片, 叠加是否成功)
+        :return: bytes，检查和重试后的图片
+        """
+        issues = check_image(image_bytes, overlay_ok=overlay_ok)
+        entry = {"问题": issues, "已重试": bool(issues)}
+        if issues:
+            size_ok = bool(image_bytes) and not any("尺寸" in issue or "无法解析" in issue for issue in issues)
+            retried_bytes, retried_overlay_ok = recompose() if size_ok else regenerate()
+            entry["重试后问题"] = check_image(retried_bytes, overlay_ok=retried_overlay_ok)
+            if len(entry["重试后问题"]) < len(issues):
+                image_bytes = retried_bytes
+        self.report["主视觉设计"] = entry
+        return image_bytes
+
+    def _run_parallel(self, func, keys):
+        """
+        并行执行func(key)，返回key到结果的映射，执行失败的key不包含在内
+        """
+        if not keys:
+            return {}
+        import contextvars
+        from concurrent.futures import ThreadPoolExecutor
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(keys))) as executor:
+            # 每个任务在调用方上下文的副本中执行，重新生成时的模型调用记入当前运行的调用收集器
+            futures = {key: executor.submit(contextvars.copy_context().run, func, key) for key in keys}
+            for key, future in futures.items():
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    print(f"重新生成{key}失败: {e}")
+        return results
@@ -0,0 +1,132 @@
+"""
+参考资料存储模块
+统一读取并缓存参考文档（txt和Word文档）的解码文本，
+供活动规划与文案创作Agent共用，每个进程内每种活动类型的文档只读取一次。
+"""
+
+import os
+import json
+import threading
+from glob import glob
+
+DEFAULT_REFERENCE_DATA_PATH = "./数据集-推送"
+
+class ReferenceStore:
+    def __init__(self, reference_data_path=DEFAULT_REFERENCE_DATA_PATH):
+        """
+        :param reference_data_path: 参考资料根目录路径，其下按活动类型分文件夹存放文档
+        """
+        self.reference_data_path = reference_data_path
+        self._documents = {}
+        self._json_texts = {}
+        self._lock = threading.Lock()
+
+    def get_documents(self, activity_type):
+        """
+        获取对应活动类型的全部参考文档，首次调用时读取并解码，之后直接返回缓存
+        :param activity_type: 活动类型，对应参考资料目录下的子文件夹名
+        :return: list，每项为包含type、filename、content的dict
+        """
+        with self._lock:
+            if activity_type not in self._documents:
+                self._documents[activity_type] = self._read_documents(activity_type)
+            return self._documents[activity_type]
+
+    def get_json(self, activity_type):
+        """
+        获取对应活动类型参考文档的JSON结构化文本
+        :param activity_type: 活动类型
+        :return: str，JSON字符串；没有文档时返回空字符串
+        """
+        documents = self.get_documents(activity_type)
+        if not documents:
+            return ""
+        with self._lock:
+            if activity_type not in self._json_texts:
+                try:
+                    self._json_texts[activity_type] = json.dumps(documents, ensure_ascii=False)
+                except Exception as e:
+                    print(f"转换为JSON失败: {e}")
+                    self._json_texts[activity_type] = ""
+            return self._json_texts[activity_type]
+
+    def get_excerpt(self, activity_type, budget=2000):
+        """
+        获取对应活动类型参考文档的纯文本摘录，总长度不超过budget个字符
+        预算（含文档之间的分隔符）在各文档之间分配，每篇文档截取开头部分并标注文件名
+        :param activity_type: 活动类型
+        :param budget: int，摘录的最大字符数
+        :return: str，UTF-8纯文本摘录；没有文档时返回空字符串
+        """
+        documents = [doc for doc in self.get_documents(activity_type) if doc["content"].strip()]
+        if not documents or budget <= 0:
+            return ""
+
+        separator = "\n\n"
+        # 预算过小时只摘录前几篇文档，保证每篇至少能分到一个字符
+        documents = documents[:max((budget + len(separator)) // (len(separator) + 1), 1)]
+        pieces = [f"【{doc['filename']}】\n" + doc["content"].strip() for doc in documents]
+        # 先扣除文档之间分隔符占用的字符数，剩余预算从最短的文档开始平均分配，
+        # 短文档用不完的预算留给其余文档；预算不足以容纳文件名时截断文件名，而不是丢弃整篇文档
+        remaining = budget - len(separator) * (len(pieces) - 1)
+        shares = {}
+        order = sorted(range(len(pieces)), key=lambda i: len(pieces[i]))
+        for position, index in enumerate(order):
+            shares[index] = min(len(pieces[index]), remaining // (len(pieces) - position))
+            remaining -= shares[index]
+        excerpts = [piece[:shares[index]] for index, piece in enumerate(pieces)]
+        return separator.join(excerpts)
+
+    def _read_documents(self, activity_type):
+        """
+        读取对应活动类型文件夹下的所有txt和Word文档内容
+        Word文档使用python-docx库解析
+        """
+        folder_path = os.path.join(self.reference_data_path, activity_type)
+        if not os.path.exists(folder_path):
+            return []
+
+        texts = []
+
+        # 读取txt文件
+        txt_files = sorted(glob(os.path.join(folder_path, "*.txt")))
+        for txt_file in txt_files:
+            try:
+                with open(txt_file, "r", encoding="utf-8") as f:
+                    content = f.read()
+                texts.append({"type": "txt", "filename": os.path.basename(txt_file), "content": content})
+            except Exception as e:
+                print(f"读取文档 {txt_file} 失败: {e}")
+
+        # 读取Word文档
+        docx_files = sorted(glob(os.path.join(folder_path, "*.docx")))
+        if docx_files:
+            try:
+                from docx import Document
+            except ImportError as e:
+                print(f"未安装python-docx，跳过Word文档: {e}")
+                docx_files = []
+        for docx_file in docx_files:
+            try:
+                doc = Document(docx_file)
+                content = "\n".join(para.text for para in doc.paragraphs)
+                texts.append({"type": "docx", "filename": os.path.basename(docx_file), "content": content})
+            except Exception as e:
+                print(f"读取Word文档 {docx_file} 失败: {e}")
+
+        return texts
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_reference_store(reference_data_path=DEFAULT_REFERENCE_DATA_PATH):
+    """
+    获取指定参考资料目录对应的共享ReferenceStore实例，同一进程内同一目录只创建一次
+    :param reference_data_path: 参考资料根目录路径
+    :return: ReferenceStore
+    """
+    key = os.path.abspath(reference_data_path)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = ReferenceStore(reference_data_path)
+        return _stores[key]
@@ -0,0 +1,77 @@
+"""
+结果输出模块
+定义结果输出接口（ResultSink），各阶段产出一旦完成即写入磁盘或其他存储，
+协调Agent不再在内存中持有全部文本和图片，运行结束时写出清单文件（manifest）。
+"""
+
+import os
+import json
+
+class ResultSink:
+    """
+    结果输出基类，子类实现_store方法即可接入不同的存储（本地磁盘、对象存储等）
+    """
+
+    def __init__(self):
+        self.manifest = {}
+
+    def write_text(self, key, text):
+        """
+        写出文本产出，自动将字符串中的转义换行符\\n替换为真实换行
+        :param key: str，产出名称，如“活动规划方案”“宣传文案_邮件通知版本”
+        :param text: str，文本内容
+        :return: str，产出的存储位置
+        """
+        data = text.replace("\\n", "\n").encode("utf-8")
+        location = self._store(f"{key}.txt", data)
+        self.manifest[key] = location
+        return location
+
+    def write_image(self, key, image_bytes, extension="png"):
+        """
+        写出图片产出
+        :param key: str，产出名称，如“主视觉设计”
+        :param image_bytes: bytes，图片二进制数据
+        :param extension: str，文件扩展名
+        :return: str，产出的存储位置
+        """
+        location = self._store(f"{key}.{extension}", image_bytes)
+        self.manifest[key] = location
+        return location
+
+    def close(self):
+        """
+        写出清单文件，记录本次运行全部产出的名称与存储位置
+        :return: dict，产出名称到存储位置的映射
+        """
+        data = json.dumps(self.manifest, ensure_ascii=False, indent=2).encode("utf-8")
+        self._store("manifest.json", data)
+        return self.manifest
+
+    def _store(self, name, data):
+        """
+        将二进制数据写入存储
+        :param name: str，产出文件名
+        :param data: bytes，二进制数据
+        :return: str，存储位置
+        """
+        raise NotImplementedError
+
+class FileResultSink(ResultSink):
+    def __init__(self, output_dir=".", prefix="output_"):
+        """
+        :param output_dir: 输出目录
+        :param prefix: 输出文件名前缀
+        """
+        super().__init__()
+        self.output_dir = output_dir
+        self.prefix = prefix
+
+    def _store(self, name, data):
+        save_path = os.path.join(self.output_dir, f"{self.prefix}{name}")
+        dir_path = os.path.dirname(save_path)
+        if dir_path and not os.path.exists(dir_path):
+            os.makedirs(dir_path)
+        with open(save_path, "wb") as f:
+            f.write(data)
+        return save_path
@@ -0,0 +1,233 @@
+"""
+运行历史存储模块
+使用本地SQLite数据库记录每次运行的需求输入、解析结果、各阶段耗时、
+每次模型调用的提示词、输出、耗时、token用量、缓存命中和错误，
+并提供按阶段和模型统计p50/p95耗时、列出最慢运行的查询报告。
+
+报告命令（在项目根目录下）：
+    python -m event_planning_system.run_store report --db event_planning_runs.db
+"""
+
+import argparse
+import json
+import math
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+
+DEFAULT_DB_PATH = "event_planning_runs.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    total_seconds REAL,
+    status TEXT,
+    error TEXT,
+    input_text TEXT,
+    demand_info TEXT,
+    outputs TEXT,
+    quality_report TEXT
+);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    stage TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS calls (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    task TEXT,
+    tier TEXT,
+    model TEXT,
+    seconds REAL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    cache_hit_tokens INTEGER,
+    prompt TEXT,
+    output TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_stages_run ON stages(run_id);
+CREATE INDEX IF NOT EXISTS idx_calls_run ON calls(run_id);
+"""
+
+def _to_json(value):
+    """
+    将运行结果转换为JSON文本，图片等二进制数据只记录字节数
+    """
+    return json.dumps(value, ensure_ascii=False, default=lambda obj: f"<{len(obj)}字节>" if isinstance(obj, (bytes, bytearray)) else str(obj))
+
+def percentile(values, pct):
+    """
+    计算百分位数（最近秩法）
+    :param values: list，数值列表
+    :param pct: float，百分位，0~100
+    :return: float，百分位数；列表为空时返回None
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+class RunStore:
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        """
+        :param db_path: SQLite数据库文件路径
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def record_run(self, run_record, calls):
+        """
+        写入一次运行的完整记录
+        :param run_record: dict，包含started_at、total_seconds、status、error、input_text、demand_info、
+                           outputs、quality_report、stages（阶段名到{"seconds", "error"}的映射）
+        :param calls: list，本次运行的模型调用记录（见model_router.collect_calls），
+                      被丢弃的推测任务中的调用tier为"discarded"
+        :return: int，运行编号
+        """
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO runs (started_at, total_seconds, status, error, input_text, demand_info, outputs, quality_report) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_record.get("started_at", time.time()), run_record.get("total_seconds"),
+                 run_record.get("status"), run_record.get("error"), run_record.get("input_text"),
+                 _to_json(run_record.get("demand_info")), _to_json(run_record.get("outputs")),
+                 _to_json(run_record.get("quality_report")))
+            )
+            run_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO stages (run_id, stage, seconds, error) VALUES (?, ?, ?, ?)",
+                [(run_id, stage, timing["seconds"], timing.get("error")) for stage, timing in run_record.get("stages", {}).items()]
+            )
+            conn.executemany(
+                "INSERT INTO calls (run_id, task, tier, model, seconds, prompt_tokens, completion_tokens, cache_hit_tokens, prompt, output, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(run_id, call["task"], call["tier"], call["model"], call["seconds"], call["prompt_tokens"],
+                  call["completion_tokens"], call["cache_hit_tokens"], call.get("prompt"), call.get("output"), call["error"])
+                 for call in calls]
+            )
+        return run_id
+
+    def stage_latency(self, since=None):
+        """
+        按阶段统计耗时
+        :param since: float，只统计该时间戳之后开始的运行，None表示全部
+        :return: list，每项为{"stage", "count", "p50", "p95", "max"}
+        """
+        rows = self._query(
+            "SELECT stages.stage, stages.seconds FROM stages JOIN runs ON runs.id = stages.run_id WHERE runs.started_at >= ?",
+            (since or 0,)
+        )
+        return self._latency_groups(rows, ("stage",))
+
+    def call_latency(self, since=None):
+        """
+        按(任务, 模型)统计模型调用耗时和token用量
+        :param since: float，只统计该时间戳之后开始的运行，None表示全部
+        :return: list，每项为{"task", "model", "count", "p50", "p95", "max", "prompt_tokens", "completion_tokens",
+                 "cache_hit_tokens", "errors", "discarded"}，discarded为被丢弃的推测调用次数
+        """
+        rows = self._query(
+            "SELECT calls.task, calls.model, calls.seconds, calls.prompt_tokens, calls.completion_tokens, "
+            "calls.cache_hit_tokens, calls.error, calls.tier FROM calls JOIN runs ON runs.id = calls.run_id WHERE runs.started_at >= ?",
+            (since or 0,)
+        )
+        groups = self._latency_groups([(task, model, seconds) for task, model, seconds, *_ in rows], ("task", "model"))
+        totals = {}
+        for task, model, _, prompt_tokens, completion_tokens, cache_hit_tokens, error, tier in rows:
+            total = totals.setdefault((task, model), {"prompt_tokens": 0, "completion_tokens": 0, "cache_hit_tokens": 0,
+                                                      "errors": 0, "discarded": 0})
+            total["prompt_tokens"] += prompt_tokens or 0
+            total["completion_tokens"] += completion_tokens or 0
+            total["cache_hit_tokens"] += cache_hit_tokens or 0
+            total["errors"] += 1 if error else 0
+            total["discarded"] += 1 if tier == "discarded" else 0
+        for group in groups:
+            group.update(totals[(group["task"], group["model"])])
+        return groups
+
+    def slowest_runs(self, limit=5, since=None):
+        """
+        列出总耗时最长的运行
+        :param limit: int，列出的数量
+        :param since: float，只列出该时间戳之后开始的运行，None表示全部
+        :return: list，每项为{"id", "started_at", "total_seconds", "status", "input_text"}
+        """
+        rows = self._query(
+            "SELECT id, started_at, total_seconds, status, input_text FROM runs "
+            "WHERE total_seconds IS NOT NULL AND started_at >= ? ORDER BY total_seconds DESC LIMIT ?",
+            (since or 0, limit)
+        )
+        return [dict(zip(("id", "started_at", "total_seconds", "status", "input_text"), row)) for row in rows]
+
+    def _latency_groups(self, rows, key_fields):
+        """
+        按key_fields分组计算p50/p95/max耗时，rows每行为key_fields各字段加耗时
+        """
+        groups = {}
+        for row in rows:
+            groups.setdefault(tuple(row[:-1]), []).append(row[-1])
+        result = []
+        for key, values in groups.items():
+            group = dict(zip(key_fields, key))
+            group.update({"count": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95), "max": max(values)})
+            result.append(group)
+        return sorted(result, key=lambda group: group["p95"], reverse=True)
+
+    def _query(self, sql, params=()):
+        with self._lock, self._connect() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    @contextmanager
+    def _connect(self):
+        """
+        打开数据库连接并开启事务，退出时提交（异常时回滚）并关闭连接
+        """
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            with conn:
+                yield conn
+
+def print_report(store, since_days=None, limit=5):
+    """
+    打印运行历史报告：各阶段和各模型的p50/p95耗时，以及最慢的运行
+    :param store: RunStore
+    :param since_days: float，只统计最近若干天的运行，None表示全部
+    :param limit: int，列出的最慢运行数量
+    """
+    since = time.time() - since_days * 86400 if since_days else None
+
+    print("各阶段耗时（秒）：")
+    for group in store.stage_latency(since):
+        print(f"  {group['stage']:<10} 次数{group['count']:>5}  p50 {group['p50']:8.2f}  p95 {group['p95']:8.2f}  最大 {group['max']:8.2f}")
+
+    print("各任务/模型调用耗时（秒）与token用量：")
+    for group in store.call_latency(since):
+        print(f"  {group['task']}（{group['model']}） 次数{group['count']:>5}  p50 {group['p50']:8.2f}  p95 {group['p95']:8.2f}  "
+              f"输入{group['prompt_tokens']}/输出{group['completion_tokens']} tokens  缓存命中{group['cache_hit_tokens']} tokens  失败{group['errors']}次  丢弃的推测{group['discarded']}次")
+
+    print(f"最慢的{limit}次运行：")
+    for run in store.slowest_runs(limit, since):
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run["started_at"]))
+        summary = (run["input_text"] or "").replace("\n", " ")[:40]
+        print(f"  #{run['id']}  {started}  {run['total_seconds']:8.2f}秒  {run['status']}  {summary}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查询运行历史，统计各阶段和各模型的耗时")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    report_parser = subparsers.add_parser("report", help="打印p50/p95耗时和最慢的运行")
+    report_parser.add_argument("--db", default=DEFAULT_DB_PATH, help="SQLite数据库文件路径")
+    report_parser.add_argument("--days", type=float, default=None, help="只统计最近若干天的运行")
+    report_parser.add_argument("--limit", type=int, default=5, help="列出的最慢运行数量")
+    args = parser.parse_args(argv)
+
+    if args.command == "report":
+        print_report(RunStore(args.db), args.days, args.limit)
+
+if __name__ == "__main__":
+    main()
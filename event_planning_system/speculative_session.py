@@ -0,0 +1,154 @@
+"""
+推测执行会话模块
+服务模式下在用户仍在输入需求时增量解析部分文本，
+一旦识别出活动类型和主题方向，即提前启动只依赖这些字段的阶段
+（规则生成、主视觉基底图片生成）；最终解析结果不一致时取消并丢弃推测结果。
+
+推测任务在守护线程中执行，启动后先等待start_delay秒，期间字段发生变化则在调用外部API之前取消；
+已经发出的API请求无法中断（仍会计费），但其结果会被丢弃，且程序退出时不会等待这些请求结束。
+"""
+
+import threading
+from concurrent.futures import Future
+
+from event_planning_system.model_router import collect_calls
+
+class SpeculativeJob(Future):
+    def __init__(self, func, args, start_delay):
+        """
+        在守护线程中执行一个推测任务，本身即为该任务的Future
+        任务期间的模型调用记录在model_calls中，复用推测结果的运行据此记入自己的调用明细
+        :param func: 函数，推测执行的阶段
+        :param args: tuple，func的参数
+        :param start_delay: float，调用func之前等待的秒数，期间可无代价地取消
+        """
+        super().__init__()
+        self.model_calls = []
+        self._released = threading.Event()
+        threading.Thread(target=self._run, args=(func, args, start_delay), daemon=True).start()
+
+    def release(self):
+        """
+        结束等待，立即开始执行
+        """
+        self._released.set()
+
+    def cancel(self):
+        """
+        取消任务：尚在等待时不会再调用外部API；已开始执行时只能丢弃结果
+        """
+        cancelled = super().cancel()
+        self._released.set()
+        return cancelled
+
+    def _run(self, func, args, start_delay):
+        self._released.wait(start_delay)
+        if not self.set_running_or_notify_cancel():
+            return
+        try:
+            with collect_calls(self.model_calls):
+                result = func(*args)
+        except Exception as e:
+            self.set_exception(e)
+        else:
+            self.set_result(result)
+
+class SpeculativeSession:
+    def __init__(self, coordinator, stable_updates=1, text_only=False, start_delay=1.0):
+        """
+        :param coordinator: CoordinatorAgent
+        :param stable_updates: int，字段在连续多少次解析中保持不变才启动推测，默认首次识别出即启动
+        :param text_only: bool，为True时不推测生成主视觉
+        :param start_delay: float，推测任务启动后等待多少秒才调用外部API，期间字段变化可无代价地取消
+        """
+        self.coordinator = coordinator
+        self.stable_updates = stable_updates
+        self.text_only = text_only
+        self.start_delay = start_delay
+        self.style_guide = coordinator.style_analyzer.get_style_guide()
+        # 每个推测阶段记录：依赖字段的最近取值、连续出现次数、已启动任务对应的取值和SpeculativeJob
+        self._candidates = {}
+        self._speculated = {}
+        # 已丢弃的推测任务，其中已完成的模型调用仍会计费，由最终运行记入调用明细
+        self._discarded = []
+
+    def update(self, partial_text):
+        """
+        增量解析当前已输入的部分需求文本，识别出所依赖的字段后提前启动对应阶段
+        :param partial_text: str，目前为止输入的全部需求文本
+        :return: dict，本次解析得到的活动需求信息
+        """
+        demand_info = self.coordinator.demand_parser.parse_and_infer(partial_text)
+        for stage, key in self._stage_keys(demand_info).items():
+            if key is None:
+                continue
+            last_key, count = self._candidates.get(stage, (None, 0))
+            count = count + 1 if key == last_key else 1
+            self._candidates[stage] = (key, count)
+            if count >= self.stable_updates and self._speculated.get(stage, (None, None))[0] != key:
+                self._discard(stage)
+                self._speculated[stage] = (key, self._submit(stage, demand_info))
+                print(f"已识别需求字段（{'、'.join(key)}），提前启动{stage}阶段")
+        return demand_info
+
+    def finalize(self, input_text, sink=None, export_specs=None, run_store=None):
+        """
+        以完整需求文本运行整个流程，复用依赖字段与最终解析结果一致的推测任务，其余丢弃
+        :param input_text: str，完整的需求文本
+        :param sink: ResultSink，可选，同CoordinatorAgent.run
+        :param export_specs: list，可选，同CoordinatorAgent.run
+        :param run_store: RunStore，可选，同CoordinatorAgent.run
+        :return: dict，同CoordinatorAgent.run
+        """
+        demand_info = self.coordinator.demand_parser.parse_and_infer(input_text)
+        final_keys = self._stage_keys(demand_info)
+        prefetched = {}
+        for stage in list(self._speculated):
+            key, job = self._speculated[stage]
+            if key == final_keys.get(stage):
+                # 复用的任务交给本次运行，不再由close取消
+                del self._speculated[stage]
+                job.release()
+                prefetched[stage] = job
+            else:
+                print(f"最终需求与推测不一致，丢弃{stage}阶段的推测结果")
+                self._discard(stage)
+        try:
+            return self.coordinator.run(input_text, sink=sink, text_only=self.text_only,
+                                        export_specs=export_specs, prefetched=prefetched,
+                                        run_store=run_store, discarded=self._discarded)
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        关闭会话，取消尚未调用外部API的推测任务；已在调用外部API的任务无法中断，
+        其结果会被丢弃，且由于在守护线程中执行，不会阻塞程序退出
+        """
+        for stage in list(self._speculated):
+            self._discard(stage)
+
+    def _stage_keys(self, demand_info):
+        """
+        计算各推测阶段依赖的需求字段取值；活动类型尚未识别（“其他”）或主题方向仍为“未知”时不推测对应阶段
+        :return: dict，键为阶段名，值为依赖字段取值元组或None
+        """
+        activity_type = demand_info.get("活动类型", "其他")
+        if activity_type == "其他":
+            return {"rules": None, "base_visual": None}
+        theme = demand_info.get("主题方向", "未知")
+        keys = {"rules": (activity_type,)}
+        keys["base_visual"] = None if self.text_only or theme == "未知" else (activity_type, theme)
+        return keys
+
+    def _submit(self, stage, demand_info):
+        if stage == "rules":
+            return SpeculativeJob(self.coordinator.event_planner.generate_rules, (demand_info.get("活动类型"),), self.start_delay)
+        return SpeculativeJob(self.coordinator.visual_designer.generate_base_visual,
+                              (self.style_guide, dict(demand_info)), self.start_delay)
+
+    def _discard(self, stage):
+        if stage in self._speculated:
+            _, job = self._speculated.pop(stage)
+            job.cancel()
+            self._discarded.append(job)
@@ -2,18 +2,23 @@
 主视觉设计Agent模块
 负责根据活动类型和风格指南，调用外部图片生成API，
 生成符合大信科风格的活动主视觉设计（png格式）。
+PIL只在实际处理图片时导入，纯文本流程不会加载。
 """
 
 from event_planning_system.api_clients import ImageGenerationClient
+from event_planning_system.quality_control import check_image_prompt, sanitize_image_prompt
 
 import os
 import io
-from PIL import Image
 
 class VisualDesignAgent:
-    def __init__(self):
+    def __init__(self, image_worker=None):
+        """
+        :param image_worker: ImageWorkerPool，可选；传入时素材加载和叠加合成在进程池中执行
+        """
         self.image_client = ImageGenerationClient()
         self.necessary_elements_path = "./数据集-图片/必要元素"
+        self.image_worker = image_worker
 
     def _load_necessary_element_images(self):
         """
@@ -32,6 +37,12 @@ class VisualDesignAgent:
         if not os.path.exists(folder_path):
             print(f"文件夹不存在: {folder_path}")
             return images_data
+        if self.image_worker is not None:
+            file_paths = [os.path.join(folder_path, filename) for filename in os.listdir(folder_path)]
+            return self.image_worker.load_images(file_paths)
+
+        from PIL import Image
+
         for filename in os.listdir(folder_path):
             filepath = os.path.join(folder_path, filename)
             try:
@@ -51,8 +62,22 @@ class VisualDesignAgent:
         :param demand_info: dict，活动需求信息
         :return: bytes，生成的图片二进制数据（PNG格式）
         """
-        # 根据风格指南和活动信息构造提示词，加入必要元素提示
+        base_img_data = self.generate_base_visual(style_guide, demand_info)
+        return self.compose_main_visual(base_img_data, demand_info.get("活动类型", ""))
+
+    def generate_base_visual(self, style_guide, demand_info):
+        """
+        调用图片生成API生成主视觉基底图片（未叠加logo等素材），可供主视觉和多尺寸导出共用
+        :param style_guide: dict，风格指南
+        :param demand_info: dict，活动需求信息
+        :return: bytes，生成的图片二进制数据；生成失败时返回None
+        """
+        # 根据风格指南和活动信息构造提示词，加入必要元素提示，并去除禁用字符
         prompt = self._build_prompt(style_guide, demand_info)
+        prompt_issues = check_image_prompt(prompt)
+        if prompt_issues:
+            print(f"图片提示词{prompt_issues[0]}，已自动去除")
+            prompt = sanitize_image_prompt(prompt)
 
         # 加载必要元素图片
         necessary_images = self._load_necessary_element_images()
@@ -71,45 +96,89 @@ class VisualDesignAgent:
         images = self.image_client.generate_image_with_elements(prompt, all_images, model="flux-dev", size="1024x1024")
 
         if images and len(images) > 0:
-            # 生成后处理，透明叠加另一张图片到生成图片的右下角和左上角
-            base_img_data = images[0]
-            try:
-                result_img_data = self._process_overlays(base_img_data, activity_type)
-                return result_img_data
-            except Exception as e:
-                print(f"生成后叠加图片失败: {e}")
-                return base_img_data
+            return images[0]
         else:
             return None
 
+    def compose_main_visual(self, base_img_data, activity_type=None):
+        """
+        生成后处理，透明叠加另一张图片到生成图片的右下角和左上角
+        :param base_img_data: bytes，生成的基底图片二进制数据
+        :param activity_type: str，活动类型，用于判断叠加图片
+        :return: bytes，叠加后的图片二进制数据；叠加失败时返回基底图片，基底为空时返回None
+        """
+        return self.compose_main_visual_with_status(base_img_data, activity_type)[0]
+
+    def compose_main_visual_with_status(self, base_img_data, activity_type=None):
+        """
+        同compose_main_visual，同时返回素材是否全部叠加成功，供质量控制阶段检查
+        :return: tuple，(图片二进制数据, 叠加是否全部成功)
+        """
+        if not base_img_data:
+            return None, False
+        try:
+            if self.image_worker is not None:
+                layers = self._overlay_layers(activity_type)
+                overlay_ok = all(self.image_worker.share_sprite(path) is not None for path, _, _ in layers)
+                return self.image_worker.composite(base_img_data, layers), overlay_ok
+            return self._process_overlays(base_img_data, activity_type)
+        except Exception as e:
+            print(f"生成后叠加图片失败: {e}")
+            return base_img_data, False
+
+    def export_main_visual(self, base_img_data, activity_type=None, export_specs=None):
+        """
+        以同一张基底图片导出多种尺寸和格式的主视觉，叠加素材按各尺寸重新定位
+        :param base_img_data: bytes，生成的基底图片二进制数据
+        :param activity_type: str，活动类型，用于判断叠加图片
+        :param export_specs: list，导出规格列表，默认使用poster_export.DEFAULT_EXPORT_SPECS
+        :return: dict，键为规格名称，值为{"data": bytes, "extension": str}
+        """
+        from event_planning_system.poster_export import PosterExporter
+
+        exporter = PosterExporter(export_specs, self.image_worker)
+        return exporter.export(base_img_data, self._overlay_layers(activity_type))
+
     def _process_overlays(self, base_img_data, activity_type=None):
         """
         处理生成图片的叠加操作，调用_overlay_image函数实现叠加
         :param base_img_data: bytes，生成图片的二进制数据
         :param activity_type: str，活动类型，用于判断叠加图片
-        :return: bytes，叠加后的图片二进制数据
+        :return: tuple，(叠加后的图片二进制数据, 叠加是否全部成功)
         """
+        from PIL import Image
+
+        overlay_ok = True
         with Image.open(io.BytesIO(base_img_data)) as base_img:
             base_img = base_img.convert("RGBA")
 
-            # 根据活动类型选择右下角叠加图片
-            if activity_type == "晚会类":
-                overlay_filename = "ball.png"
-            else:
-                overlay_filename = "lion.png"
-
-            overlay_path = os.path.join("./数据集-图片/必要元素", overlay_filename)
-            self._overlay_image(base_img, overlay_path, scale=0.3, position="bottom_right")
-
-            # 左上角叠加logo
-            logo_path = os.path.join("./数据集-图片/必要元素", "logo.png")
-            self._overlay_image(base_img, logo_path, scale=0.3, position="top_left")
+            for overlay_path, scale, position in self._overlay_layers(activity_type):
+                if not self._overlay_image(base_img, overlay_path, scale=scale, position=position):
+                    overlay_ok = False
 
             # 保存到字节流
             with io.BytesIO() as output:
                 base_img.save(output, format="PNG")
                 result_img_data = output.getvalue()
-        return result_img_data
+        return result_img_data, overlay_ok
+
+    def _overlay_layers(self, activity_type=None):
+        """
+        根据活动类型确定需要叠加的图片及其位置
+        :param activity_type: str，活动类型
+        :return: list，每项为(叠加图片路径, scale, position)
+        """
+        # 根据活动类型选择右下角叠加图片
+        if activity_type == "晚会类":
+            overlay_filename = "ball.png"
+        else:
+            overlay_filename = "lion.png"
+
+        return [
+            (os.path.join(self.necessary_elements_path, overlay_filename), 0.3, "bottom_right"),
+            # 左上角叠加logo
+            (os.path.join(self.necessary_elements_path, "logo.png"), 0.3, "top_left")
+        ]
 
     def _overlay_image(self, base_img, overlay_path, scale=0.2, position="bottom_right"):
         """
@@ -119,25 +188,18 @@ class VisualDesignAgent:
         :param overlay_path: str，叠加图片文件路径
         :param scale: float，叠加图片相对于基底图片宽度的缩放比例，范围0~1
         :param position: str，叠加位置，支持 "top_left", "top_right", "bottom_left", "bottom_right"
+        :return: bool，是否叠加成功
         """
+        from PIL import Image
+        from event_planning_system.image_worker import paste_overlay
+
         try:
             with Image.open(overlay_path) as overlay_img:
-                overlay_width = int(base_img.width * scale)
-                overlay_height = int(overlay_img.height * (overlay_width / overlay_img.width))
-                overlay_img = overlay_img.resize((overlay_width, overlay_height), Image.Resampling.LANCZOS).convert("RGBA")
-
-                if position == "top_left":
-                    pos = (10, 10)
-                elif position == "top_right":
-                    pos = (base_img.width - overlay_width - 10, 10)
-                elif position == "bottom_left":
-                    pos = (10, base_img.height - overlay_height - 10)
-                else:  # bottom_right
-                    pos = (base_img.width - overlay_width - 10, base_img.height - overlay_height - 10)
-
-                base_img.paste(overlay_img, pos, overlay_img)
+                paste_overlay(base_img, overlay_img, scale, position)
+            return True
         except Exception as e:
             print(f"叠加图片失败({overlay_path}): {e}")
+            return False
 
     def _build_prompt(self, style_guide, demand_info):
         """
@@ -0,0 +1,36 @@
+import contextvars
+import threading
+
+from event_planning_system.model_router import ModelRouter, collect_calls
+
+
+def test_collect_calls_is_scoped_to_each_run():
+    router = ModelRouter()
+    results = {}
+
+    def run(name):
+        with collect_calls() as calls:
+            router.record(name, "draft", "模型", 1.0, prompt="提示词", output="输出")
+        results[name] = calls
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in ("甲", "乙")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    router.record("丙", "draft", "模型", 1.0)
+
+    assert [call["task"] for call in results["甲"]] == ["甲"]
+    assert [call["task"] for call in results["乙"]] == ["乙"]
+    assert results["甲"][0]["prompt"] == "提示词"
+    assert sum(group["calls"] for group in router.summary()) == 3
+
+
+def test_collect_calls_follows_copied_context():
+    router = ModelRouter()
+    with collect_calls() as calls:
+        context = contextvars.copy_context()
+        thread = threading.Thread(target=context.run, args=(router.record, "重试", "upgrade", "模型", 1.0))
+        thread.start()
+        thread.join()
+    assert [call["task"] for call in calls] == ["重试"]
@@ -0,0 +1,30 @@
+from event_planning_system.reference_store import ReferenceStore
+
+
+def make_store(lengths):
+    store = ReferenceStore("不存在的目录")
+    store._documents["测试类"] = [
+        {"type": "txt", "filename": f"文档{i}.txt", "content": "字" * length} for i, length in enumerate(lengths)
+    ]
+    return store
+
+
+def test_excerpt_counts_separators():
+    assert len(make_store([5000] * 4).get_excerpt("测试类", 3000)) == 3000
+
+
+def test_excerpt_passes_unused_budget_on():
+    excerpt = make_store([5000, 100, 5000]).get_excerpt("测试类", 3000)
+    assert len(excerpt) == 3000
+    assert "【文档1.txt】\n" + "字" * 100 in excerpt
+
+
+def test_excerpt_truncates_header_when_budget_is_small():
+    excerpt = make_store([5000] * 4).get_excerpt("测试类", 60)
+    assert 0 < len(excerpt) <= 60
+    assert excerpt.count("\n\n") == 3
+
+
+def test_excerpt_keeps_short_documents_whole():
+    excerpt = make_store([10, 10]).get_excerpt("测试类", 3000)
+    assert excerpt == "【文档0.txt】\n" + "字" * 10 + "\n\n【文档1.txt】\n" + "字" * 10
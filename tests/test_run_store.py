@@ -0,0 +1,29 @@
+from event_planning_system.run_store import RunStore, percentile
+
+
+def test_percentile_nearest_rank():
+    assert percentile([2, 1], 50) == 1
+    assert percentile(range(1, 7), 50) == 3
+    assert percentile(range(1, 11), 50) == 5
+    assert percentile(range(1, 11), 95) == 10
+    assert percentile(range(1, 101), 95) == 95
+    assert percentile([7], 0) == 7
+    assert percentile([], 50) is None
+
+
+def test_stage_latency_groups_by_stage(tmp_path):
+    store = RunStore(str(tmp_path / "runs.db"))
+    for seconds in (1.0, 2.0, 3.0, 4.0):
+        store.record_run({"total_seconds": seconds, "status": "成功", "input_text": "需求",
+                          "stages": {"活动规划": {"seconds": seconds, "error": None}}}, [])
+    (group,) = store.stage_latency()
+    assert (group["stage"], group["count"], group["p50"], group["p95"]) == ("活动规划", 4, 2.0, 4.0)
+    assert [run["total_seconds"] for run in store.slowest_runs(2)] == [4.0, 3.0]
+
+
+def test_slowest_runs_respects_since(tmp_path):
+    store = RunStore(str(tmp_path / "runs.db"))
+    store.record_run({"started_at": 100.0, "total_seconds": 9.0, "stages": {}}, [])
+    store.record_run({"started_at": 200.0, "total_seconds": 1.0, "stages": {}}, [])
+    assert [run["total_seconds"] for run in store.slowest_runs(5, since=150.0)] == [1.0]
+    assert [run["total_seconds"] for run in store.slowest_runs(5)] == [9.0, 1.0]